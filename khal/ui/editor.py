@@ -20,6 +20,7 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import datetime as dt
+import re
 
 import urwid
 
@@ -30,7 +31,77 @@ from .widgets import (AlarmsEditor, Choice, DateConversionError, DateWidget,
                       TimeWidget, ValidatedEdit)
 
 
+# regexes for the strftime directives we can parse without strptime, these
+# mirror the ones used by the stdlib's _strptime module
+_DIRECTIVES = {
+    'd': r'(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])',
+    'm': r'(?P<m>1[0-2]|0[1-9]|[1-9])',
+    'y': r'(?P<y>\d\d)',
+    'Y': r'(?P<Y>\d\d\d\d)',
+    'H': r'(?P<H>2[0-3]|[0-1]\d|\d)',
+    'M': r'(?P<M>[0-5]\d|\d)',
+    'S': r'(?P<S>6[0-1]|[0-5]\d|\d)',
+}
+
+
+def _make_parser(fmt):
+    """return a callable that parses `text` according to `fmt`
+
+    `datetime.strptime` needs to translate the format into a regex on every
+    call (only the last few are cached), which is too slow for validating
+    text on every keypress. For purely numerical formats, we compile the regex
+    once, all other formats fall back to `strptime`.
+
+    :param fmt: a strftime format string
+    :type fmt: str
+    :returns: a callable, that returns a datetime.datetime or raises
+        ValueError, just like `datetime.strptime`
+    """
+    regex = []
+    seen = set()
+    pos = 0
+    while pos < len(fmt):
+        char = fmt[pos]
+        if char == '%':
+            directive = fmt[pos + 1:pos + 2]
+            if directive == '%':
+                regex.append('%')
+            elif directive in _DIRECTIVES and directive not in seen:
+                seen.add(directive)
+                regex.append(_DIRECTIVES[directive])
+            else:
+                return lambda text: dt.datetime.strptime(text, fmt)
+            pos += 2
+        elif char.isspace():
+            if not regex or regex[-1] != r'\s+':
+                regex.append(r'\s+')
+            pos += 1
+        else:
+            regex.append(re.escape(char))
+            pos += 1
+    matcher = re.compile(''.join(regex), re.IGNORECASE).fullmatch
+
+    def parse(text):
+        match = matcher(text)
+        if match is None:
+            raise ValueError('{!r} does not match format {!r}'.format(text, fmt))
+        values = match.groupdict()
+        if 'Y' in values:
+            year = int(values['Y'])
+        elif 'y' in values:
+            year = int(values['y'])
+            year += 2000 if year <= 68 else 1900
+        else:
+            year = 1900
+        return dt.datetime(
+            year, int(values.get('m', 1)), int(values.get('d', 1)),
+            int(values.get('H', 0)), int(values.get('M', 0)), int(values.get('S', 0)),
+        )
+    return parse
+
+
 class StartEnd(object):
+    __slots__ = ('startdate', 'starttime', 'enddate', 'endtime')
 
     def __init__(self, startdate, starttime, enddate, endtime):
         """collecting some common properties"""
@@ -48,13 +119,15 @@ class CalendarPopUp(urwid.PopUpLauncher):
         self._monthdisplay = monthdisplay
         self._firstweekday = firstweekday
         self._keybindings = {} if keybindings is None else keybindings
-        self.__super.__init__(widget)
+        urwid.PopUpLauncher.__init__(self, widget)
 
     def keypress(self, size, key):
         if key == 'enter':
             self.open_pop_up()
         else:
-            return super().keypress(size, key)
+            # PopUpLauncher.keypress is only a property delegating to the
+            # wrapped widget, so we can skip resolving it via super()
+            return self._original_widget.keypress(size, key)
 
     def create_pop_up(self):
         def on_change(new_date):
@@ -97,6 +170,7 @@ class DateEdit(urwid.WidgetWrap):
     ):
         datewidth = len(startdt.strftime(dateformat)) + 1
         self._dateformat = dateformat
+        self._parse_date = _make_parser(dateformat)
         if startdt is None:
             startdt = dt.date.today()
         self._edit = ValidatedEdit(
@@ -112,7 +186,7 @@ class DateEdit(urwid.WidgetWrap):
 
     def _validate(self, text):
         try:
-            _date = dt.datetime.strptime(text, self._dateformat).date()
+            _date = self._parse_date(text).date()
         except ValueError:
             return False
         else:
@@ -133,7 +207,7 @@ class DateEdit(urwid.WidgetWrap):
 
         :type date: datetime.date
         """
-        self._edit.set_edit_text(dt.date.strftime(self._dateformat))
+        self._edit.set_edit_text(date.strftime(self._dateformat))
 
 
 class StartEndEditor(urwid.WidgetWrap):
@@ -158,13 +232,19 @@ class StartEndEditor(urwid.WidgetWrap):
         self._enddt, self._original_end = end, end
         self.on_start_date_change = on_start_date_change
         self.on_end_date_change = on_end_date_change
-        self._datewidth = len(start.strftime(self.conf['locale']['longdateformat']))
-        self._timewidth = len(start.strftime(self.conf['locale']['timeformat']))
+        self._longdatefmt = conf['locale']['longdateformat']
+        self._timefmt = conf['locale']['timeformat']
+        self._default_tz = conf['locale']['default_timezone']
+        self._parse_time = _make_parser(self._timefmt)
+        self._datewidth = len(start.strftime(self._longdatefmt))
+        self._timewidth = len(start.strftime(self._timefmt))
+        self._timewidth_padded = self._timewidth + 1
         # this will contain the widgets for [start|end] [date|time]
         self.widgets = StartEnd(None, None, None, None)
         self.checkallday = urwid.CheckBox(
             'Allday', state=self.allday, on_state_change=self.toggle)
-        self.toggle(None, self.allday)
+        self._build_once()
+        self._toggle_time_visible(self.allday)
 
     def keypress(self, size, key):
         return super().keypress(size, key)
@@ -185,17 +265,19 @@ class StartEndEditor(urwid.WidgetWrap):
 
     @property
     def localize_start(self):
-        if getattr(self.startdt, 'tzinfo', None) is None:
-            return self.conf['locale']['default_timezone'].localize
+        start = self.startdt
+        if isinstance(start, dt.datetime) and start.tzinfo is not None:
+            return start.tzinfo.localize
         else:
-            return self.startdt.tzinfo.localize
+            return self._default_tz.localize
 
     @property
     def localize_end(self):
-        if getattr(self.enddt, 'tzinfo', None) is None:
-            return self.conf['locale']['default_timezone'].localize
+        end = self.enddt
+        if isinstance(end, dt.datetime) and end.tzinfo is not None:
+            return end.tzinfo.localize
         else:
-            return self.enddt.tzinfo.localize
+            return self._default_tz.localize
 
     @property
     def enddt(self):
@@ -211,28 +293,37 @@ class StartEndEditor(urwid.WidgetWrap):
         except AttributeError:
             return dt.time(0)
 
-    def _validate_start_time(self, text):
+    def _validate_time(self, text, start):
+        """validate `text` as the start (or end) time and update it accordingly
+
+        :param start: if True, update the start, otherwise the end
+        :type start: bool
+        """
         try:
-            startval = dt.datetime.strptime(text, self.conf['locale']['timeformat'])
-            self._startdt = self.localize_start(
-                dt.datetime.combine(self._startdt.date(), startval.time()))
+            timeval = self._parse_time(text)
+            current = self._startdt if start else self._enddt
+            # only combine and localize if the time actually changed
+            if current.tzinfo is None or current.time() != timeval.time():
+                localize = self.localize_start if start else self.localize_end
+                new = localize(dt.datetime.combine(current.date(), timeval.time()))
+                if start:
+                    self._startdt = new
+                else:
+                    self._enddt = new
         except ValueError:
             return False
         else:
-            return startval
+            return timeval
+
+    def _validate_start_time(self, text):
+        return self._validate_time(text, start=True)
 
     def _start_date_change(self, date):
         self._startdt = self.localize_start(dt.datetime.combine(date, self._start_time))
         self.on_start_date_change(date)
 
     def _validate_end_time(self, text):
-        try:
-            endval = dt.datetime.strptime(text, self.conf['locale']['timeformat'])
-            self._enddt = self.localize_end(dt.datetime.combine(self._enddt.date(), endval.time()))
-        except ValueError:
-            return False
-        else:
-            return endval
+        return self._validate_time(text, start=False)
 
     def _end_date_change(self, date):
         self._enddt = self.localize_end(dt.datetime.combine(date, self._end_time))
@@ -250,65 +341,96 @@ class StartEndEditor(urwid.WidgetWrap):
         """
 
         if self.allday is True and state is False:
-            self._startdt = dt.datetime.combine(self._startdt, dt.datetime.min.time())
-            self._enddt = dt.datetime.combine(self._enddt, dt.datetime.min.time())
+            midnight = dt.time(0)
+            self._startdt = dt.datetime.combine(self._startdt, midnight)
+            self._enddt = dt.datetime.combine(self._enddt, midnight)
         elif self.allday is False and state is True:
             self._startdt = self._startdt.date()
             self._enddt = self._enddt.date()
         self.allday = state
+        self._refresh_texts()
+        self._toggle_time_visible(state)
+        self._pile.focus_position = 1
+        self._start_columns.focus_position = 1
+        self._end_columns.focus_position = 1
+
+    def _build_once(self):
+        """build all widgets, toggling allday later only swaps the time widgets"""
         self.widgets.startdate = DateEdit(
-            self._startdt, self.conf['locale']['longdateformat'],
+            self._startdt, self._longdatefmt,
             self._start_date_change, self.conf['locale']['weeknumbers'],
             self.conf['locale']['firstweekday'],
             self.conf['view']['monthdisplay'],
             self.conf['keybindings'],
         )
         self.widgets.enddate = DateEdit(
-            self._enddt, self.conf['locale']['longdateformat'],
+            self._enddt, self._longdatefmt,
             self._end_date_change, self.conf['locale']['weeknumbers'],
             self.conf['locale']['firstweekday'],
             self.conf['view']['monthdisplay'],
             self.conf['keybindings'],
         )
-
-        if state is True:
-            timewidth = 1
-            self.widgets.starttime = urwid.Text('')
-            self.widgets.endtime = urwid.Text('')
-        elif state is False:
-            timewidth = self._timewidth + 1
-            raw_start_time_widget = ValidatedEdit(
-                dateformat=self.conf['locale']['timeformat'],
-                EditWidget=TimeWidget,
-                validate=self._validate_start_time,
-                edit_text=self.startdt.strftime(self.conf['locale']['timeformat']),
-            )
-            self.widgets.starttime = urwid.Padding(
-                raw_start_time_widget, align='left', width=self._timewidth + 1, left=1)
-
-            raw_end_time_widget = ValidatedEdit(
-                dateformat=self.conf['locale']['timeformat'],
-                EditWidget=TimeWidget,
-                validate=self._validate_end_time,
-                edit_text=self.enddt.strftime(self.conf['locale']['timeformat']),
-            )
-            self.widgets.endtime = urwid.Padding(
-                raw_end_time_widget, align='left', width=self._timewidth + 1, left=1)
-
-        columns = NPile([
-            self.checkallday,
-            NColumns([(5, urwid.Text('From:')), (self._datewidth, self.widgets.startdate), (
-                timewidth, self.widgets.starttime)], dividechars=1),
-            NColumns(
-                [(5, urwid.Text('To:')), (self._datewidth, self.widgets.enddate),
-                 (timewidth, self.widgets.endtime)],
-                dividechars=1)
-        ], focus_item=1)
-        urwid.WidgetWrap.__init__(self, columns)
+        self._start_time_edit = ValidatedEdit(
+            dateformat=self._timefmt,
+            EditWidget=TimeWidget,
+            validate=self._validate_start_time,
+            edit_text=self._start_time.strftime(self._timefmt),
+        )
+        self._end_time_edit = ValidatedEdit(
+            dateformat=self._timefmt,
+            EditWidget=TimeWidget,
+            validate=self._validate_end_time,
+            edit_text=self._end_time.strftime(self._timefmt),
+        )
+        self._start_time_widget = urwid.Padding(
+            self._start_time_edit, align='left', width=self._timewidth_padded, left=1)
+        self._end_time_widget = urwid.Padding(
+            self._end_time_edit, align='left', width=self._timewidth_padded, left=1)
+        self._start_time_empty = urwid.Text('')
+        self._end_time_empty = urwid.Text('')
+
+        self._start_columns = NColumns(
+            [(5, urwid.Text('From:')), (self._datewidth, self.widgets.startdate),
+             (1, self._start_time_empty)],
+            dividechars=1)
+        self._end_columns = NColumns(
+            [(5, urwid.Text('To:')), (self._datewidth, self.widgets.enddate),
+             (1, self._end_time_empty)],
+            dividechars=1)
+        self._pile = NPile(
+            [self.checkallday, self._start_columns, self._end_columns], focus_item=1)
+        # column options for the time column, with and without time widgets
+        self._time_options = self._start_columns.options('given', self._timewidth_padded)
+        self._no_time_options = self._start_columns.options('given', 1)
+        urwid.WidgetWrap.__init__(self, self._pile)
+
+    def _refresh_texts(self):
+        """update the text of all date and time widgets from startdt and enddt"""
+        startdt, enddt = self.startdt, self.enddt
+        self.widgets.startdate.date = startdt
+        self.widgets.enddate.date = enddt
+        if not self.allday:
+            self._start_time_edit.set_edit_text(startdt.strftime(self._timefmt))
+            self._end_time_edit.set_edit_text(enddt.strftime(self._timefmt))
+
+    def _toggle_time_visible(self, allday):
+        """show the time widgets if `allday` is False, hide them otherwise"""
+        if allday:
+            options = self._no_time_options
+            self.widgets.starttime = self._start_time_empty
+            self.widgets.endtime = self._end_time_empty
+        else:
+            options = self._time_options
+            self.widgets.starttime = self._start_time_widget
+            self.widgets.endtime = self._end_time_widget
+        self._start_columns.contents[2] = (self.widgets.starttime, options)
+        self._end_columns.contents[2] = (self.widgets.endtime, options)
 
     @property
     def changed(self):
         """returns True if content has been edited, False otherwise"""
+        if self._startdt is self._original_start and self._enddt is self._original_end:
+            return False
         return (self.startdt != self._original_start) or (self.enddt != self._original_end)
 
     def validate(self):
@@ -593,6 +715,17 @@ class RecurrenceEditor(urwid.WidgetWrap):
             self._conf['view']['monthdisplay'],
         )
 
+        # the first line of the editor, without repeat and with repeat, never
+        # changes (only the widgets in it do), so we only build both once
+        self._repeat_line = NColumns([(13, self.repeat_box)])
+        self._first_line = NColumns([
+            (13, self.repeat_box),
+            (11, self.recurrence_choice),
+            (11, self.interval_edit),
+        ])
+        # the until line only gets its second column swapped on rebuild
+        self._until_line = NColumns([(16, self.until_choice)])
+
         self._rebuild_weekday_checks()
         self._rebuild_monthly_choice()
         self._pile = pile = NPile([urwid.Text('')])
@@ -686,28 +819,26 @@ class RecurrenceEditor(urwid.WidgetWrap):
         self._pile.set_focus(2)
 
     def _rebuild_edit_no_repeat(self):
-        lines = [NColumns([(13, self.repeat_box)])]
-        self._refill_contents(lines)
+        self._refill_contents([self._repeat_line])
 
     def _rebuild_edit(self):
-        firstline = NColumns([
-            (13, self.repeat_box),
-            (11, self.recurrence_choice),
-            (11, self.interval_edit),
-        ])
-        lines = [firstline]
+        self._first_line.focus_position = 0
+        lines = [self._first_line]
 
         if self.recurrence_choice.active == "weekly":
             lines.append(self.weekday_checks)
         if self.recurrence_choice.active == "monthly":
             lines.append(self.monthly_choice)
 
-        nextline = [(16, self.until_choice)]
+        until_line = self._until_line
+        del until_line.contents[1:]
         if self.until_choice.active == "Until":
-            nextline.append((20, self.until_edit))
+            until_line.contents.append((self.until_edit, until_line.options('given', 20)))
         elif self.until_choice.active == "Repetitions":
-            nextline.append((4, self.repetitions_edit))
-        lines.append(NColumns(nextline))
+            until_line.contents.append(
+                (self.repetitions_edit, until_line.options('given', 4)))
+        until_line.focus_position = 0
+        lines.append(until_line)
 
         self._refill_contents(lines)
 
@@ -234,6 +234,8 @@ class Choice(urwid.PopUpLauncher):
         urwid.PopUpLauncher.__init__(self, self.button)
         urwid.connect_signal(self.button, 'click',
                              lambda button: self.open_pop_up())
+        # the button has been replaced, so any cached canvas is stale
+        self._invalidate()
 
 
 class ChoiceList(urwid.WidgetWrap):
@@ -418,6 +420,14 @@ class ValidatedEdit(urwid.WidgetWrap):
         self._validate()
         return self.base_widget.get_edit_text()
 
+    def set_edit_text(self, text):
+        """replace the current text, move the cursor to its end and reset the
+        attributes to their (not yet validated) defaults"""
+        self.base_widget.set_edit_text(text)
+        self.base_widget.set_edit_pos(len(text))
+        self._original_widget.set_attr_map({None: 'edit'})
+        self._original_widget.set_focus_map({None: 'editf'})
+
     @property
     def edit_pos(self):
         return self.base_widget.edit_pos
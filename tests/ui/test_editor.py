@@ -1,7 +1,8 @@
 import datetime as dt
 
 import icalendar
-from khal.ui.editor import RecurrenceEditor, StartEndEditor
+import pytest
+from khal.ui.editor import DateEdit, RecurrenceEditor, StartEndEditor, _make_parser
 
 from ..utils import BERLIN, LOCALE_BERLIN
 from .canvas_render import CanvasTranslator
@@ -17,6 +18,7 @@ palette = {
     'default': 'black',
     'editf': 'red',
     'edit': 'blue',
+    'alert': 'yellow',
 }
 
 
@@ -76,6 +78,56 @@ def test_check_understood_rrule():
     )
 
 
+def test_recurrence_editor_until():
+    editor = RecurrenceEditor(
+        icalendar.vRecur.from_ical('FREQ=WEEKLY;COUNT=3'),
+        CONF,
+        BERLIN.localize(dt.datetime(2017, 10, 2, 13)),
+    )
+    first_lines = (
+        '[X] Repeat:  < weekly  >\x1b[34mevery:1    \x1b[0m\n'
+        '[X] MO [ ] TU [ ] WE [ ] TH [ ] FR [ ] SA [ ] SU \n'
+    )
+    for until, until_line, rrule in [
+            ('Repetitions', '< Repetitions  >\x1b[34m3   \x1b[0m\n',
+             {'freq': ['weekly'], 'count': 3}),
+            ('Until', '< Until        >\x1b[34m02.10.2017 \x1b[0m         \n',
+             {'freq': ['weekly'], 'until': dt.datetime(2017, 10, 2, 13)}),
+            ('Forever', '< Forever      >\n',
+             {'freq': ['weekly']}),
+            ('Repetitions', '< Repetitions  >\x1b[34m3   \x1b[0m\n',
+             {'freq': ['weekly'], 'count': 3}),
+    ]:
+        editor.until_choice.active = until
+        editor.rebuild()
+        canvas = editor.render((50, ), True)
+        assert CanvasTranslator(canvas, palette).transform() == first_lines + until_line
+        assert editor.rrule() == rrule
+
+    editor.recurrence_choice.active = 'monthly'
+    editor.rebuild()
+    monthly = (
+        '[X] Repeat:  < monthly >\x1b[34mevery:1    \x1b[0m\n'
+        '< on every 2nd of the month                      >\n'
+        '< Repetitions  >\x1b[34m3   \x1b[0m\n'
+    )
+    canvas = editor.render((50, ), True)
+    assert CanvasTranslator(canvas, palette).transform() == monthly
+
+    # move the focus away from the repeat checkbox, turning repeat off and
+    # on again should bring it back, just like a newly built line would
+    editor._first_line.focus_position = 2
+    editor.repeat_box.set_state(False)
+    canvas = editor.render((50, ), True)
+    assert CanvasTranslator(canvas, palette).transform() == '[ ] Repeat:  \n'
+    assert editor.active is None
+    editor.repeat_box.set_state(True)
+    canvas = editor.render((50, ), True)
+    assert CanvasTranslator(canvas, palette).transform() == monthly
+    assert editor._first_line.focus_position == 0
+    assert editor.rrule() == {'freq': ['monthly'], 'count': 3}
+
+
 def test_editor():
     """test for the issue in #666"""
     editor = StartEndEditor(
@@ -131,3 +183,66 @@ def test_convert_to_date():
     assert editor.allday is True
     assert editor.startdt == dt.date(2017, 10, 2)
     assert editor.enddt == dt.date(2017, 10, 4)
+
+
+def test_convert_to_date_and_back():
+    editor = StartEndEditor(
+        BERLIN.localize(dt.datetime(2017, 10, 2, 13)),
+        BERLIN.localize(dt.datetime(2017, 10, 4, 18)),
+        conf=CONF
+    )
+    # enter an invalid start time
+    editor.keypress((10, ), 'tab')
+    for _ in range(5):
+        editor.keypress((10, ), 'backspace')
+    for char in '99:99':
+        editor.keypress((10, ), char)
+    editor.keypress((10, ), 'tab')
+    canvas = editor.render((50, ), True)
+    assert CanvasTranslator(canvas, palette).transform() == (
+        '[ ] Allday\nFrom: \x1b[34m02.10.2017\x1b[0m \x1b[33m99:99 \x1b[0m\n'
+        'To:   \x1b[34m04.10.2017\x1b[0m \x1b[34m18:00 \x1b[0m\n'
+    )
+
+    editor.checkallday.set_state(True)
+    editor.checkallday.set_state(False)
+    canvas = editor.render((50, ), True)
+    assert CanvasTranslator(canvas, palette).transform() == (
+        '[ ] Allday\nFrom: \x1b[31m2.10.2017 \x1b[0m \x1b[34m00:00 \x1b[0m\n'
+        'To:   \x1b[34m04.10.2017\x1b[0m \x1b[34m00:00 \x1b[0m\n'
+    )
+    assert editor.allday is False
+    assert editor.startdt == dt.datetime(2017, 10, 2, 0, 0)
+    assert editor.enddt == dt.datetime(2017, 10, 4, 0, 0)
+    assert editor.changed is True
+
+
+def test_date_edit_set_date():
+    date_edit = DateEdit(dt.date(2017, 10, 2), '%d.%m.%Y')
+    assert date_edit.date == dt.date(2017, 10, 2)
+    date_edit.date = dt.date(2018, 1, 5)
+    assert date_edit.date == dt.date(2018, 1, 5)
+    canvas = date_edit.render((20, ), False)
+    assert CanvasTranslator(canvas, palette).transform() == '\x1b[34m05.01.2018 \x1b[0m\n'
+
+
+def test_make_parser():
+    for fmt, text in [
+            ('%d.%m.%Y', '2.10.2017'),
+            ('%d.%m.%Y', '02.10.2017'),
+            ('%Y-%m-%d', '2017-10-02'),
+            ('%d/%m/%y', '02/10/17'),
+            ('%H:%M', '13:00'),
+            ('%H:%M', '9:5'),
+            ('%d %b %Y', '02 Oct 2017'),
+    ]:
+        assert _make_parser(fmt)(text) == dt.datetime.strptime(text, fmt)
+    for fmt, text in [
+            ('%d.%m.%Y', '32.10.2017'),
+            ('%d.%m.%Y', '30.02.2017'),
+            ('%d.%m.%Y', '02.10.2017 '),
+            ('%H:%M', '25:00'),
+            ('%H:%M', ''),
+    ]:
+        with pytest.raises(ValueError):
+            _make_parser(fmt)(text)